@@ -40,6 +40,11 @@ class User(db.Model):
     access_token = db.StringProperty(required=True)
 
 
+# Shared across requests so each user's client is only built once
+graph_registry = facebook.GraphAPIRegistry()
+graph_registry.register_app(FACEBOOK_APP_ID, FACEBOOK_APP_SECRET)
+
+
 class BaseHandler(webapp.RequestHandler):
     """Provides access to the active Facebook user in self.current_user
 
@@ -60,7 +65,8 @@ class BaseHandler(webapp.RequestHandler):
                 # a round-trip to Facebook on every request
                 user = User.get_by_key_name(cookie["uid"])
                 if not user:
-                    graph = facebook.GraphAPI(cookie["access_token"])
+                    graph = graph_registry.get(
+                        FACEBOOK_APP_ID, cookie["access_token"])
                     profile = graph.get_object("me")
                     user = User(key_name=str(profile["id"]),
                                 id=str(profile["id"]),
@@ -69,6 +75,7 @@ class BaseHandler(webapp.RequestHandler):
                                 access_token=cookie["access_token"])
                     user.put()
                 elif user.access_token != cookie["access_token"]:
+                    graph_registry.forget(FACEBOOK_APP_ID, user.access_token)
                     user.access_token = cookie["access_token"]
                     user.put()
                 self._current_user = user
@@ -79,7 +86,8 @@ class BaseHandler(webapp.RequestHandler):
         """Returns a Graph API client for the current user."""
         if not hasattr(self, "_graph"):
             if self.current_user:
-                self._graph = facebook.GraphAPI(self.current_user.access_token)
+                self._graph = graph_registry.get(
+                    FACEBOOK_APP_ID, self.current_user.access_token)
             else:
                 self._graph = facebook.GraphAPI()
         return self._graph
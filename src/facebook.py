@@ -33,11 +33,20 @@ usage of this module might look like this:
 
 """
 
+import array
 import cgi
+import collections
 import hashlib
+import hmac
 import time
 import urllib
 
+try:
+    import urlparse
+except ImportError:
+    # Python 3 moved urlparse into urllib
+    from urllib import parse as urlparse
+
 # Find a JSON parser
 try:
     import json
@@ -52,6 +61,13 @@ except ImportError:
         _parse_json = lambda s: simplejson.loads(s)
 
 
+def _utf8(s):
+    """Returns s as a UTF-8 encoded byte string."""
+    if isinstance(s, bytes):
+        return s
+    return s.encode("utf-8")
+
+
 class GraphAPI(object):
     """A client for the Facebook Graph API.
 
@@ -79,9 +95,18 @@ class GraphAPI(object):
     If you are using the JavaScript SDK, you can use the
     get_user_from_cookie() method below to get the OAuth access token
     for the active user from the cookie saved by the SDK.
+
+    If app_secret is given, every request also carries an appsecret_proof
+    (an HMAC-SHA256 of the access token keyed by the app secret). The proof
+    is computed once here rather than on every request.
     """
-    def __init__(self, access_token=None):
+    def __init__(self, access_token=None, app_secret=None):
         self.access_token = access_token
+        self.appsecret_proof = None
+        if access_token and app_secret:
+            self.appsecret_proof = hmac.new(
+                _utf8(app_secret), _utf8(access_token),
+                hashlib.sha256).hexdigest()
 
     def get_object(self, id, **args):
         """Fetchs the given object from the graph."""
@@ -100,6 +125,30 @@ class GraphAPI(object):
         """Fetchs the connections for given object."""
         return self.request(id + "/" + connection_name, args)
 
+    def iter_connections(self, id, connection_name, **args):
+        """Yields the connections for given object, following paging links.
+
+        Only one page of results is held at a time, so this is suitable for
+        connections too large to fetch in a single response. We raise a
+        GraphAPIError if a paging link points anywhere but the Graph API.
+        """
+        path = id + "/" + connection_name
+        while path:
+            response = self.request(path, args)
+            for item in response.get("data", ()):
+                yield item
+            next_url = response.get("paging", {}).get("next")
+            if not next_url or not response.get("data"):
+                break
+            url = urlparse.urlparse(next_url)
+            if url.netloc != "graph.facebook.com":
+                raise GraphAPIError("PagingError",
+                                    "Unexpected paging URL: " + next_url)
+            path = url.path.lstrip("/")
+            args = dict((k, v[-1]) for k, v in
+                        urlparse.parse_qs(url.query).items()
+                        if k not in ("access_token", "appsecret_proof"))
+
     def put_object(self, parent_object, connection_name, **data):
         """Writes the given object to the graph, connected to the given parent.
 
@@ -163,10 +212,10 @@ class GraphAPI(object):
         """
         if not args: args = {}
         if self.access_token:
-            if post_args is not None:
-                post_args["access_token"] = self.access_token
-            else:
-                args["access_token"] = self.access_token
+            auth_args = post_args if post_args is not None else args
+            auth_args["access_token"] = self.access_token
+            if self.appsecret_proof:
+                auth_args["appsecret_proof"] = self.appsecret_proof
         post_data = None if post_args is None else urllib.urlencode(post_args)
         file = urllib.urlopen("https://graph.facebook.com/" + path + "?" +
                               urllib.urlencode(args), post_data)
@@ -180,6 +229,257 @@ class GraphAPI(object):
         return response
 
 
+class GraphAPIRegistry(object):
+    """Hands out GraphAPI clients for many apps and access tokens.
+
+    Services that act on behalf of many users tend to build a new GraphAPI
+    for every request. The registry keeps one client per (app, token) pair,
+    so the per-token signing state (the appsecret_proof) is computed once
+    and reused for as long as the client stays in the registry:
+
+       registry = facebook.GraphAPIRegistry()
+       registry.register_app(app_id, app_secret)
+       graph = registry.get(app_id, access_token)
+       profile = graph.get_object("me")
+
+    At most max_clients clients are kept; when the registry is full the
+    least recently used client is dropped to make room. Call forget() when a token
+    is revoked or replaced.
+
+    Every app must be registered before clients are requested for it, so a
+    mistyped app ID cannot silently turn off request signing. Register an
+    app without a secret to get unsigned clients on purpose.
+    """
+    def __init__(self, max_clients=10000):
+        if max_clients < 1:
+            raise ValueError("max_clients must be at least 1")
+        self.max_clients = max_clients
+        self._secrets = {}
+        self._clients = collections.OrderedDict()
+
+    def register_app(self, app_id, app_secret=None):
+        """Registers an app so clients for it sign their requests."""
+        self._secrets[app_id] = app_secret
+        for key in [k for k in self._clients if k[0] == app_id]:
+            del self._clients[key]
+
+    def get(self, app_id, access_token):
+        """Returns the shared GraphAPI client for the given app and token.
+
+        Raises KeyError if the app has not been registered.
+        """
+        key = (app_id, access_token)
+        # Re-inserting moves the client to the most recently used end
+        client = self._clients.pop(key, None)
+        if client is None:
+            if app_id not in self._secrets:
+                raise KeyError("App %r is not registered" % (app_id,))
+            if len(self._clients) >= self.max_clients:
+                self._clients.popitem(last=False)
+            client = GraphAPI(access_token, self._secrets[app_id])
+        self._clients[key] = client
+        return client
+
+    def forget(self, app_id, access_token):
+        """Drops the client for the given app and token, if there is one."""
+        self._clients.pop((app_id, access_token), None)
+
+
+class ConnectionGraph(object):
+    """A compact adjacency structure for a connection across many objects.
+
+    Object IDs are interned to consecutive integers: ids[i] is the Graph API
+    ID of node i, and index[id] is its integer. The edges are stored in
+    compressed sparse row form, so the targets of node i are
+
+       indices[offsets[i]:offsets[i + 1]]
+
+    offsets and indices are array.array buffers of machine integers, which
+    convert to NumPy without copying via numpy.frombuffer(). If the edges
+    were written to a file by get_connection_graph(), indices is None.
+
+    failed maps the ID of each source whose connection could not be
+    fetched to its GraphAPIError; those sources have an empty row.
+    """
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+        self.offsets = array.array("l", [0])
+        self.indices = array.array("l")
+        self.failed = {}
+
+    def intern(self, id):
+        """Returns the integer for the given object ID, adding it if new."""
+        i = self.index.get(id)
+        if i is None:
+            i = self.index[id] = len(self.ids)
+            self.ids.append(id)
+        return i
+
+    def neighbors(self, id):
+        """Returns the IDs the given object is connected to.
+
+        Raises ValueError if the edges were written to a file rather than
+        kept in indices; slice the memory-mapped file with offsets instead.
+        """
+        if self.indices is None:
+            raise ValueError("Edges are in indices_file, not in memory")
+        i = self.index[id]
+        if i + 1 >= len(self.offsets):
+            return []
+        return [self.ids[j] for j in
+                self.indices[self.offsets[i]:self.offsets[i + 1]]]
+
+
+def get_connection_graph(graph, ids, connection_name, indices_file=None,
+                         chunk_size=65536, **args):
+    """Fetches a connection for each of the given IDs into a ConnectionGraph.
+
+    Connections are streamed page by page with GraphAPI.iter_connections and
+    only the target ID of each item is kept, so the per-item dicts are never
+    held all at once. For example, to build the friend graph of a set of users:
+
+       friends = facebook.get_connection_graph(graph, user_ids, "friends")
+
+    If indices_file is given, it should be a file opened in binary mode.
+    Edge targets are appended to it in chunks of chunk_size instead of being
+    kept in memory, and the returned graph's indices is None. The file can
+    then be memory-mapped, e.g. with numpy.memmap(path, "l").
+
+    If the connection of a source cannot be fetched (e.g., its friends are
+    not visible to the access token), its row is left empty and its error is
+    recorded in the returned graph's failed dict. The target IDs of one
+    source are buffered until all of its pages have been fetched, so a
+    failure partway through adds no nodes and never leaves a partial row in
+    indices_file. Any other
+    exception, such as a network error, aborts the export and leaves
+    indices_file incomplete.
+    """
+    result = ConnectionGraph()
+    for id in ids:
+        result.intern(id)
+    # Sources are nodes 0..n-1; targets that are not sources come after
+    # them and have no row of their own.
+    indices = result.indices
+    count = 0
+    for i in range(len(result.ids)):
+        source = result.ids[i]
+        # Targets are interned only once every page has been fetched, so a
+        # failed source adds no nodes to the graph.
+        try:
+            row = [item["id"] for item in
+                   graph.iter_connections(source, connection_name, **args)]
+        except GraphAPIError as e:
+            result.failed[source] = e
+        else:
+            indices.extend(result.intern(id) for id in row)
+            count += len(row)
+        result.offsets.append(count)
+        if indices_file is not None and len(indices) >= chunk_size:
+            indices.tofile(indices_file)
+            del indices[:]
+    if indices_file is not None:
+        indices.tofile(indices_file)
+        result.indices = None
+    return result
+
+
+class ObjectLoader(object):
+    """Batches independent get_object calls into multi-get requests.
+
+    Code that needs several objects often fetches them one at a time from
+    unrelated places. Each load() only queues the ID; the first time any
+    queued result is read, every pending ID is fetched with get_objects in
+    batches of up to max_batch_size:
+
+       loader = facebook.ObjectLoader(graph)
+       user = loader.load("me")
+       page = loader.load(page_id)
+       names = [user.get()["name"], page.get()["name"]]
+
+    Results, including errors, are kept for the life of the loader, so
+    create one per web request. Because a multi-get fails as a whole if any
+    ID is invalid, a failed batch is split in half and each half retried
+    until the bad IDs are isolated, so each caller gets its own result or
+    GraphAPIError. At most max_retries extra requests are made for each
+    batch; once they are used up, every ID still unresolved gets the error
+    of the last failed request that included it.
+    """
+    def __init__(self, graph, max_batch_size=50, max_retries=20, **args):
+        self.graph = graph
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.args = args
+        self._pending = []
+        self._queued = set()
+        self._results = {}
+
+    def load(self, id):
+        """Queues the given object ID and returns a handle to its result."""
+        if id not in self._results and id not in self._queued:
+            self._pending.append(id)
+            self._queued.add(id)
+        return _LoadedObject(self, id)
+
+    def get_object(self, id):
+        """Fetches the given object, along with any other pending IDs."""
+        return self.load(id).get()
+
+    def dispatch(self):
+        """Fetches every pending ID."""
+        pending, self._pending, self._queued = self._pending, [], set()
+        for i in range(0, len(pending), self.max_batch_size):
+            self._fetch(pending[i:i + self.max_batch_size])
+
+    def _fetch(self, batch):
+        retries = 0
+        batches = [batch]
+        while batches:
+            batch = batches.pop()
+            try:
+                if len(batch) == 1:
+                    response = {batch[0]: self.graph.get_object(
+                        batch[0], **self.args)}
+                else:
+                    response = self.graph.get_objects(batch, **self.args)
+            except GraphAPIError as e:
+                if len(batch) == 1 or retries + 2 > self.max_retries:
+                    for id in batch:
+                        self._results[id] = (None, e)
+                    continue
+                retries += 2
+                middle = len(batch) // 2
+                batches.append(batch[middle:])
+                batches.append(batch[:middle])
+                continue
+            for id in batch:
+                if id in response:
+                    self._results[id] = (response[id], None)
+                else:
+                    self._results[id] = (None, GraphAPIError(
+                        "NotFound", "Object %s was not returned" % id))
+
+    def _get(self, id):
+        if id not in self._results:
+            self.load(id)
+            self.dispatch()
+        result, error = self._results[id]
+        if error is not None:
+            raise error
+        return result
+
+
+class _LoadedObject(object):
+    """The pending result of ObjectLoader.load()."""
+    def __init__(self, loader, id):
+        self.loader = loader
+        self.id = id
+
+    def get(self):
+        """Returns the object, or raises its GraphAPIError."""
+        return self.loader._get(self.id)
+
+
 class GraphAPIError(Exception):
     def __init__(self, type, message):
         Exception.__init__(self, message)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#
+# Copyright 2010 Facebook
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Tests for the Facebook Python client, run against a stubbed request()."""
+
+import array
+import hashlib
+import hmac
+import os.path
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import facebook
+
+
+class StubGraphAPI(facebook.GraphAPI):
+    """A GraphAPI that answers request() from a dict of path -> response."""
+    def __init__(self, responses):
+        facebook.GraphAPI.__init__(self, "token")
+        self.responses = responses
+        self.requests = []
+
+    def request(self, path, args=None, post_args=None):
+        self.requests.append((path, dict(args or {})))
+        response = self.responses[path]
+        if isinstance(response, list):
+            response = response.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class StopRequest(Exception):
+    pass
+
+
+def request_args(graph, path, args=None, post_args=None):
+    """Runs graph.request() up to the point where it would open a URL.
+
+    Returns the query and POST arguments it would have sent.
+    """
+    saved = dict((name, getattr(facebook.urllib, name, None))
+                 for name in ("urlencode", "urlopen"))
+
+    def urlopen(url, data=None):
+        raise StopRequest()
+    facebook.urllib.urlencode = lambda args: ""
+    facebook.urllib.urlopen = urlopen
+    try:
+        graph.request(path, args, post_args)
+    except StopRequest:
+        pass
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                delattr(facebook.urllib, name)
+            else:
+                setattr(facebook.urllib, name, value)
+    return args, post_args
+
+
+class AppSecretProofTest(unittest.TestCase):
+    expected = hmac.new(b"sec", b"tok", hashlib.sha256).hexdigest()
+
+    def test_proof_for_str_and_unicode(self):
+        for secret, token in [("sec", "tok"), (u"sec", u"tok"),
+                              (b"sec", b"tok")]:
+            graph = facebook.GraphAPI(token, secret)
+            self.assertEqual(graph.appsecret_proof, self.expected)
+
+    def test_proof_for_non_ascii_unicode(self):
+        graph = facebook.GraphAPI(u"t\u00f6k", u"s\u00e9c")
+        expected = hmac.new(u"s\u00e9c".encode("utf-8"),
+                            u"t\u00f6k".encode("utf-8"), hashlib.sha256)
+        self.assertEqual(graph.appsecret_proof, expected.hexdigest())
+
+    def test_request_sends_proof_with_secret(self):
+        graph = facebook.GraphAPI("tok", "sec")
+        args, post_args = request_args(graph, "me", {"fields": "id"})
+        self.assertEqual(args, {"fields": "id", "access_token": "tok",
+                                "appsecret_proof": self.expected})
+        args, post_args = request_args(graph, "me/feed", {"fields": "id"},
+                                       {"message": "Hi"})
+        self.assertEqual(args, {"fields": "id"})
+        self.assertEqual(post_args, {"message": "Hi", "access_token": "tok",
+                                     "appsecret_proof": self.expected})
+
+    def test_request_omits_proof_without_secret(self):
+        graph = facebook.GraphAPI("tok")
+        args, post_args = request_args(graph, "me", {"fields": "id"})
+        self.assertEqual(args, {"fields": "id", "access_token": "tok"})
+        args, post_args = request_args(graph, "me/feed", None,
+                                       {"message": "Hi"})
+        self.assertEqual(post_args, {"message": "Hi", "access_token": "tok"})
+
+
+class GraphAPIRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = facebook.GraphAPIRegistry(max_clients=2)
+        self.registry.register_app("app", "sec")
+
+    def test_get_reuses_clients(self):
+        graph = self.registry.get("app", "tok")
+        self.assertTrue(self.registry.get("app", "tok") is graph)
+        self.assertEqual(graph.appsecret_proof,
+                         AppSecretProofTest.expected)
+
+    def test_unregistered_app(self):
+        self.assertRaises(KeyError, self.registry.get, "other", "tok")
+
+    def test_max_clients_must_be_positive(self):
+        self.assertRaises(ValueError, facebook.GraphAPIRegistry, 0)
+
+    def test_forget(self):
+        graph = self.registry.get("app", "tok")
+        self.registry.forget("app", "tok")
+        self.assertFalse(self.registry.get("app", "tok") is graph)
+
+    def test_register_app_drops_clients(self):
+        graph = self.registry.get("app", "tok")
+        self.registry.register_app("app", "new secret")
+        self.assertFalse(self.registry.get("app", "tok") is graph)
+        self.assertNotEqual(self.registry.get("app", "tok").appsecret_proof,
+                            graph.appsecret_proof)
+
+    def test_evicts_least_recently_used(self):
+        x = self.registry.get("app", "x")
+        y = self.registry.get("app", "y")
+        self.registry.get("app", "x")
+        self.registry.get("app", "z")
+        self.assertTrue(self.registry.get("app", "x") is x)
+        self.assertFalse(self.registry.get("app", "y") is y)
+
+
+def page(ids, next_url=None):
+    response = {"data": [{"id": id} for id in ids]}
+    if next_url:
+        response["paging"] = {"next": next_url}
+    return response
+
+
+class IterConnectionsTest(unittest.TestCase):
+    def test_follows_paging_links(self):
+        graph = StubGraphAPI({"1/friends": [
+            page(["2", "3"], "https://graph.facebook.com/1/friends"
+                             "?access_token=token&limit=2&offset=2"),
+            page(["4"], "https://graph.facebook.com/1/friends"
+                        "?access_token=token&limit=2&offset=4"),
+            page([]),
+        ]})
+        ids = [item["id"] for item in graph.iter_connections("1", "friends")]
+        self.assertEqual(ids, ["2", "3", "4"])
+        self.assertEqual(graph.requests[1],
+                         ("1/friends", {"limit": "2", "offset": "2"}))
+
+    def test_rejects_foreign_paging_host(self):
+        graph = StubGraphAPI({"1/friends": page(
+            ["2"], "https://example.com/1/friends?offset=1")})
+        self.assertRaises(facebook.GraphAPIError, list,
+                          graph.iter_connections("1", "friends"))
+
+
+class ConnectionGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = StubGraphAPI({
+            "1/friends": page(["2", "3"]),
+            "2/friends": page(["1", "4"]),
+            "3/friends": facebook.GraphAPIError("OAuthException", "Denied"),
+        })
+
+    def test_builds_csr(self):
+        result = facebook.get_connection_graph(
+            self.graph, ["1", "2", "3"], "friends")
+        self.assertEqual(result.ids, ["1", "2", "3", "4"])
+        self.assertEqual(list(result.offsets), [0, 2, 4, 4])
+        self.assertEqual(list(result.indices), [1, 2, 0, 3])
+        self.assertEqual(result.neighbors("2"), ["1", "4"])
+        self.assertEqual(result.neighbors("4"), [])
+        self.assertEqual(list(result.failed.keys()), ["3"])
+
+    def test_failure_on_later_page_adds_nothing(self):
+        graph = StubGraphAPI({
+            "1/friends": [
+                page(["2"], "https://graph.facebook.com/1/friends?offset=1"),
+                facebook.GraphAPIError("OAuthException", "Expired"),
+            ],
+            "4/friends": page(["1"]),
+        })
+        result = facebook.get_connection_graph(graph, ["1", "4"], "friends")
+        self.assertEqual(result.ids, ["1", "4"])
+        self.assertEqual(list(result.offsets), [0, 0, 1])
+        self.assertEqual(list(result.indices), [0])
+        self.assertEqual(list(result.failed.keys()), ["1"])
+
+    def test_spills_indices_to_file(self):
+        indices_file = tempfile.TemporaryFile()
+        result = facebook.get_connection_graph(
+            self.graph, ["1", "2", "3"], "friends",
+            indices_file=indices_file, chunk_size=1)
+        self.assertEqual(list(result.offsets), [0, 2, 4, 4])
+        self.assertRaises(ValueError, result.neighbors, "1")
+        indices_file.seek(0)
+        indices = array.array("l")
+        indices.fromfile(indices_file, 4)
+        self.assertEqual(list(indices), [1, 2, 0, 3])
+
+
+class MultiGetGraphAPI(facebook.GraphAPI):
+    """A GraphAPI whose multi-gets fail if any of the IDs is unknown."""
+    def __init__(self, objects):
+        facebook.GraphAPI.__init__(self, "token")
+        self.objects = objects
+        self.requests = []
+
+    def request(self, path, args=None, post_args=None):
+        ids = args["ids"].split(",") if path == "" else [path]
+        self.requests.append(ids)
+        for id in ids:
+            if id not in self.objects:
+                raise facebook.GraphAPIError("OAuthException", "Bad " + id)
+        if path:
+            return self.objects[path]
+        return dict((id, self.objects[id]) for id in ids)
+
+
+class ObjectLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = MultiGetGraphAPI(dict(
+            (str(i), {"id": str(i)}) for i in range(64)))
+
+    def test_batches_and_memoizes(self):
+        loader = facebook.ObjectLoader(self.graph)
+        handles = [loader.load(id) for id in ["1", "2", "1", "3"]]
+        self.assertEqual([h.get()["id"] for h in handles],
+                         ["1", "2", "1", "3"])
+        self.assertEqual(loader.get_object("2"), {"id": "2"})
+        self.assertEqual(self.graph.requests, [["1", "2", "3"]])
+
+    def test_isolates_bad_id(self):
+        loader = facebook.ObjectLoader(self.graph)
+        ids = [str(i) for i in range(50)]
+        ids[17] = "bad"
+        handles = [loader.load(id) for id in ids]
+        self.assertRaises(facebook.GraphAPIError, handles[17].get)
+        for i, handle in enumerate(handles):
+            if i != 17:
+                self.assertEqual(handle.get(), {"id": ids[i]})
+        self.assertTrue(len(self.graph.requests) <= 13)
+
+    def test_caps_retries(self):
+        loader = facebook.ObjectLoader(self.graph, max_retries=2)
+        handles = [loader.load(id) for id in ["1", "2", "bad", "3"]]
+        self.assertEqual(handles[0].get(), {"id": "1"})
+        self.assertRaises(facebook.GraphAPIError, handles[3].get)
+        self.assertEqual(len(self.graph.requests), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()